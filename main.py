@@ -6,20 +6,27 @@ Deployment: Render (Web Service)
 """
 
 import os
+import html
 import json
-import base64
+import orjson
 import asyncio
+import bisect
+import functools
+import concurrent.futures
+import time
+from collections import OrderedDict
 import websockets
 import aiohttp
 from fastapi import FastAPI, WebSocket, Request, BackgroundTasks
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
 import gspread
 from google.oauth2.service_account import Credentials
 from googleapiclient.discovery import build
-import re
 from typing import Optional, Dict, Any, List
 import logging
 
@@ -40,12 +47,42 @@ GOOGLE_CREDENTIALS_JSON = os.getenv("GOOGLE_CREDENTIALS_JSON")  # Service accoun
 SHEET_ID = os.getenv("GOOGLE_SHEET_ID")  # Leads spreadsheet
 AGENT_EMAIL = os.getenv("AGENT_EMAIL")  # Mark's email for calendar invites
 
+# Optional sampling profiler (py-spy must be installed and allowed to ptrace)
+ENABLE_PYSPY = os.getenv("ENABLE_PYSPY")
+PYSPY_OUTPUT = os.getenv("PYSPY_OUTPUT", "/tmp/profile.svg")
+PYSPY_DURATION = int(os.getenv("PYSPY_DURATION", 60))
+# Wait this long after startup before recording, so the profile covers live calls
+PYSPY_DELAY = int(os.getenv("PYSPY_DELAY", 300))
+
 # Agent Configuration
 AGENT_NAME = "Mark Esposito"
 AGENT_COMPANY = "Berkshire Hathaway HomeServices Québec"
 AGENT_PHONE = "+1-514-XXX-XXXX"  # Update with actual number
 AGENT_SPECIALTIES = ["Westmount", "Downtown Montreal", "Luxury Condos", "Triplexes", "Investment Properties"]
 AGENT_AREAS = ["Westmount", "Montreal Downtown", "Plateau-Mont-Royal", "Outremont", "Griffintown", "NDG"]
+AGENT_TIMEZONE = "America/Montreal"
+AGENT_TZ = ZoneInfo(AGENT_TIMEZONE)
+
+# Slots offered when Calendar is not configured or a lookup fails
+MOCK_CALENDAR_SLOTS = ["10:00 AM", "2:00 PM", "4:00 PM"]
+
+# Sheets write batching: flush after this many rows or this many seconds
+SHEETS_BATCH_SIZE = 50
+SHEETS_FLUSH_INTERVAL = 0.5
+
+# How long a day's busy intervals are reused before re-querying Calendar
+CALENDAR_CACHE_TTL = 30
+
+# Sessions with no audio or tool activity for this long are closed by the janitor
+SESSION_IDLE_TIMEOUT = 300
+SESSION_JANITOR_INTERVAL = 60
+# Ended sessions are kept this long before the final lead log and removal
+SESSION_CLEANUP_DELAY = 300
+# Upper bound on tracked sessions; the oldest is evicted beyond this
+MAX_ACTIVE_SESSIONS = int(os.getenv("MAX_ACTIVE_SESSIONS", 500))
+
+# OpenAI audio deltas arriving within this window go to Twilio as one media frame
+AUDIO_COALESCE_WINDOW = 0.01
 
 # OpenAI Realtime API Configuration
 OPENAI_REALTIME_URL = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview-2024-12-17"
@@ -138,11 +175,52 @@ Always confirm phone number before ending call for follow-up purposes."""
 
 # ==================== GOOGLE INTEGRATIONS ====================
 
+def parse_appointment_time(date_str: str, time_str: str) -> datetime:
+    """Parse "YYYY-MM-DD" and "HH:MM AM/PM" without going through strptime"""
+    clock, meridiem = time_str.split()
+    hour, minute = clock.split(":")
+    hour = int(hour)
+    meridiem = meridiem.upper()
+    if meridiem not in ("AM", "PM") or not 1 <= hour <= 12:
+        raise ValueError(f"Invalid appointment time: {time_str}")
+    hour = hour % 12 + (12 if meridiem == "PM" else 0)
+    return datetime.fromisoformat(date_str).replace(hour=hour, minute=int(minute))
+
+def compute_free_slots(busy_starts: List[int], busy_ends: List[int], day_start: int,
+                       day_end: int, step: int, duration: int, limit: int) -> List[int]:
+    """
+    Start times (epoch seconds) of up to `limit` free slots in [day_start, day_end).
+    Busy intervals must be sorted and non-overlapping.
+    """
+    free = []
+    n = len(busy_starts)
+    for slot_start in range(day_start, day_end, step):
+        # First busy interval ending after the slot starts is the only candidate overlap
+        i = bisect.bisect_right(busy_ends, slot_start)
+        if i < n and busy_starts[i] < slot_start + duration:
+            continue
+        free.append(slot_start)
+        if len(free) == limit:
+            break
+    return free
+
 class GoogleIntegration:
     def __init__(self):
         self.creds = None
         self.sheets_service = None
         self.calendar_service = None
+        # The Calendar client's httplib2 connection isn't thread-safe, so all
+        # Calendar calls go through this single worker one at a time
+        self._calendar_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="calendar"
+        )
+        # Spreadsheet/worksheet handles, opened once (each open is a metadata round trip)
+        self._spreadsheet = None
+        self._worksheets: Dict[str, Any] = {}
+        # (worksheet, row) pairs waiting for the background sheet writer
+        self._row_queue: asyncio.Queue = asyncio.Queue()
+        # date_str -> (fetched_at, [(busy_start, busy_end), ...])
+        self._cal_cache: Dict[str, tuple] = {}
         self._init_services()
     
     def _init_services(self):
@@ -162,18 +240,101 @@ class GoogleIntegration:
                 self.calendar_service = build('calendar', 'v3', credentials=self.creds, cache_discovery=False)
                 logger.info("Google services initialized successfully")
         except Exception as e:
-            logger.error(f"Google services init failed: {e}")
+            logger.error("Google services init failed: %s", e)
+        
+        try:
+            if self.sheets_service and SHEET_ID:
+                for title in ("Leads", "Appointments"):
+                    self._get_worksheet(title)
+        except Exception as e:
+            logger.error("Opening CRM worksheets failed: %s", e)
+        
+        # Swap in no-op handlers for anything unconfigured so callers skip the checks
+        if not self.sheets_service or not SHEET_ID:
+            self.log_lead = self._log_lead_to_console
+        if not self.calendar_service:
+            self.check_calendar_availability = self._mock_calendar_availability
+            self.book_appointment = self._mock_book_appointment
+    
+    async def _log_lead_to_console(self, lead_data: Dict[str, Any]):
+        """log_lead stand-in when Google Sheets is not configured"""
+        logger.warning("Google Sheets not configured, logging to console")
+        print(f"LEAD LOG: {json.dumps(lead_data, indent=2)}")
+    
+    async def _mock_calendar_availability(self, date_str: str, duration_minutes: int = 60) -> List[str]:
+        """check_calendar_availability stand-in when Calendar is not configured"""
+        return MOCK_CALENDAR_SLOTS
+    
+    async def _mock_book_appointment(self, booking_data: Dict[str, Any]) -> bool:
+        """book_appointment stand-in when Calendar is not configured"""
+        logger.info("MOCK BOOKING: %s", booking_data)
+        return True
+    
+    def _get_worksheet(self, title: str):
+        """Cached worksheet handle (blocking on first use)"""
+        sheet = self._worksheets.get(title)
+        if sheet is None:
+            if self._spreadsheet is None:
+                self._spreadsheet = self.sheets_service.open_by_key(SHEET_ID)
+            sheet = self._worksheets[title] = self._spreadsheet.worksheet(title)
+        return sheet
+    
+    def _append_rows(self, worksheet: str, rows: List[List[Any]]):
+        """Blocking batch append to a worksheet; run via asyncio.to_thread"""
+        self._get_worksheet(worksheet).append_rows(rows, value_input_option="RAW")
+    
+    def _enqueue_row(self, worksheet: str, row: List[Any]):
+        """Queue a row for the background sheet writer"""
+        self._row_queue.put_nowait((worksheet, row))
+    
+    async def _flush_rows(self, batch: List[tuple]):
+        """Append queued rows with one Sheets request per worksheet"""
+        grouped: Dict[str, List[List[Any]]] = {}
+        for worksheet, row in batch:
+            grouped.setdefault(worksheet, []).append(row)
+        
+        for worksheet, rows in grouped.items():
+            try:
+                await asyncio.to_thread(self._append_rows, worksheet, rows)
+                logger.info("Appended %s row(s) to %s", len(rows), worksheet)
+            except Exception as e:
+                logger.error("Failed to append rows to %s: %s", worksheet, e)
+    
+    async def run_sheet_writer(self):
+        """
+        Background task: drain the row queue in batches. Exits (after writing
+        everything it holds) once stop_sheet_writer's sentinel comes through.
+        """
+        while True:
+            batch = [await self._row_queue.get()]
+            # Let rows from concurrent calls accumulate, then take what's there
+            await asyncio.sleep(SHEETS_FLUSH_INTERVAL)
+            while len(batch) < SHEETS_BATCH_SIZE and not self._row_queue.empty():
+                batch.append(self._row_queue.get_nowait())
+            
+            rows = [item for item in batch if item is not None]
+            if rows:
+                await self._flush_rows(rows)
+            if len(rows) < len(batch):
+                return
+    
+    def stop_sheet_writer(self):
+        """Ask the sheet writer to flush what it has and exit"""
+        self._row_queue.put_nowait(None)
+    
+    async def flush_pending_rows(self):
+        """Write out anything queued after the writer exited (used at shutdown)"""
+        batch = []
+        while not self._row_queue.empty():
+            item = self._row_queue.get_nowait()
+            if item is not None:
+                batch.append(item)
+        if batch:
+            await self._flush_rows(batch)
     
     async def log_lead(self, lead_data: Dict[str, Any]):
         """Log lead to Google Sheets CRM"""
         try:
-            if not self.sheets_service or not SHEET_ID:
-                logger.warning("Google Sheets not configured, logging to console")
-                print(f"LEAD LOG: {json.dumps(lead_data, indent=2)}")
-                return
-            
-            sheet = self.sheets_service.open_by_key(SHEET_ID).worksheet("Leads")
-            
             # Format row data
             row = [
                 datetime.now().isoformat(),
@@ -191,72 +352,90 @@ class GoogleIntegration:
                 "New"
             ]
             
-            sheet.append_row(row)
-            logger.info(f"Lead logged: {lead_data.get('name', 'Unknown')}")
+            self._enqueue_row("Leads", row)
+            logger.info("Lead queued: %s", lead_data.get('name', 'Unknown'))
             
         except Exception as e:
-            logger.error(f"Failed to log lead: {e}")
+            logger.error("Failed to log lead: %s", e)
+    
+    async def _run_calendar(self, fn):
+        """Run a blocking Calendar API call on the dedicated calendar thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._calendar_executor, fn)
+    
+    async def _get_busy_intervals(self, date_str: str, day: datetime) -> List[tuple]:
+        """
+        Busy (start, end) epoch-second intervals for a day, sorted and merged,
+        cached for CALENDAR_CACHE_TTL
+        """
+        cached = self._cal_cache.get(date_str)
+        if cached and time.monotonic() - cached[0] < CALENDAR_CACHE_TTL:
+            return cached[1]
+        
+        body = {
+            "timeMin": day.isoformat(),
+            "timeMax": (day + timedelta(days=1)).isoformat(),
+            "items": [{"id": "primary"}]
+        }
+        freebusy = await self._run_calendar(
+            lambda: self.calendar_service.freebusy().query(body=body).execute()
+        )
+        
+        calendar = freebusy['calendars']['primary']
+        if calendar.get('errors'):
+            # Per-calendar failures come back with an empty busy list; don't
+            # treat them (or cache them) as a free day
+            raise RuntimeError(f"freebusy errors: {calendar['errors']}")
+        
+        intervals = sorted(
+            (int(datetime.fromisoformat(b['start'].replace('Z', '+00:00')).timestamp()),
+             int(datetime.fromisoformat(b['end'].replace('Z', '+00:00')).timestamp()))
+            for b in calendar.get('busy', [])
+        )
+        
+        # Merge overlaps so both starts and ends are sorted
+        busy = []
+        for start, end in intervals:
+            if busy and start <= busy[-1][1]:
+                busy[-1] = (busy[-1][0], max(busy[-1][1], end))
+            else:
+                busy.append((start, end))
+        
+        # Drop expired days so the cache only holds recently queried dates
+        now = time.monotonic()
+        self._cal_cache = {
+            d: entry for d, entry in self._cal_cache.items()
+            if now - entry[0] < CALENDAR_CACHE_TTL
+        }
+        self._cal_cache[date_str] = (now, busy)
+        return busy
     
     async def check_calendar_availability(self, date_str: str, duration_minutes: int = 60) -> List[str]:
         """Check available slots in Mark's calendar"""
         try:
-            if not self.calendar_service:
-                # Return mock slots if not configured
-                return ["10:00 AM", "2:00 PM", "4:00 PM"]
-            
-            # Parse date
-            date_obj = datetime.strptime(date_str, "%Y-%m-%d")
-            time_min = date_obj.isoformat() + "Z"
-            time_max = (date_obj + timedelta(days=1)).isoformat() + "Z"
-            
-            events_result = self.calendar_service.events().list(
-                calendarId='primary',
-                timeMin=time_min,
-                timeMax=time_max,
-                singleEvents=True,
-                orderBy='startTime'
-            ).execute()
-            
-            events = events_result.get('items', [])
-            
-            # Generate available slots (9 AM to 8 PM)
-            booked_slots = []
-            for event in events:
-                start = event['start'].get('dateTime', event['start'].get('date'))
-                if 'T' in start:
-                    booked_slots.append(datetime.fromisoformat(start.replace('Z', '+00:00')))
-            
-            available = []
-            current = date_obj.replace(hour=9, minute=0)
-            end = date_obj.replace(hour=20, minute=0)
+            # Parse date (Mark's local day)
+            day = datetime.fromisoformat(date_str).replace(tzinfo=AGENT_TZ)
+            busy = await self._get_busy_intervals(date_str, day)
             
-            while current < end:
-                is_available = True
-                for booked in booked_slots:
-                    booked_local = booked.replace(tzinfo=None)
-                    if (booked_local.hour == current.hour and 
-                        abs(booked_local.minute - current.minute) < duration_minutes):
-                        is_available = False
-                        break
-                
-                if is_available:
-                    available.append(current.strftime("%I:%M %p"))
-                
-                current += timedelta(minutes=60)  # 1-hour slots
+            # Generate available 1-hour slots (9 AM to 8 PM), top 5 options
+            available = compute_free_slots(
+                [start for start, _ in busy],
+                [end for _, end in busy],
+                day_start=int(day.replace(hour=9).timestamp()),
+                day_end=int(day.replace(hour=20).timestamp()),
+                step=3600,
+                duration=duration_minutes * 60,
+                limit=5
+            )
             
-            return available[:5]  # Return top 5 options
+            return [datetime.fromtimestamp(ts, AGENT_TZ).strftime("%I:%M %p") for ts in available]
             
         except Exception as e:
-            logger.error(f"Calendar check failed: {e}")
-            return ["10:00 AM", "2:00 PM", "4:00 PM"]  # Fallback
+            logger.error("Calendar check failed: %s", e)
+            return MOCK_CALENDAR_SLOTS  # Fallback
     
     async def book_appointment(self, booking_data: Dict[str, Any]) -> bool:
         """Book appointment in Google Calendar and log to Sheets"""
         try:
-            if not self.calendar_service:
-                logger.info(f"MOCK BOOKING: {booking_data}")
-                return True
-            
             # Create calendar event
             date_str = booking_data.get("date")
             time_str = booking_data.get("time")
@@ -264,8 +443,7 @@ class GoogleIntegration:
             location = booking_data.get("location", "Phone/Video Call")
             
             # Parse datetime
-            datetime_str = f"{date_str} {time_str}"
-            start_time = datetime.strptime(datetime_str, "%Y-%m-%d %I:%M %p")
+            start_time = parse_appointment_time(date_str, time_str)
             end_time = start_time + timedelta(hours=1)
             
             event = {
@@ -282,11 +460,11 @@ Booked by AI Receptionist. Mark to confirm.
                 """,
                 'start': {
                     'dateTime': start_time.isoformat(),
-                    'timeZone': 'America/Montreal',
+                    'timeZone': AGENT_TIMEZONE,
                 },
                 'end': {
                     'dateTime': end_time.isoformat(),
-                    'timeZone': 'America/Montreal',
+                    'timeZone': AGENT_TIMEZONE,
                 },
                 'attendees': [
                     {'email': AGENT_EMAIL} if AGENT_EMAIL else None,
@@ -304,16 +482,19 @@ Booked by AI Receptionist. Mark to confirm.
             # Remove None attendees
             event['attendees'] = [a for a in event['attendees'] if a]
             
-            event_result = self.calendar_service.events().insert(
-                calendarId='primary',
-                body=event,
-                sendUpdates='all'
-            ).execute()
+            event_result = await self._run_calendar(
+                lambda: self.calendar_service.events().insert(
+                    calendarId='primary',
+                    body=event,
+                    sendUpdates='all'
+                ).execute()
+            )
+            # The cached availability for this day is now stale
+            self._cal_cache.pop(date_str, None)
             
             # Log to Appointments sheet
             if self.sheets_service and SHEET_ID:
-                sheet = self.sheets_service.open_by_key(SHEET_ID).worksheet("Appointments")
-                sheet.append_row([
+                self._enqueue_row("Appointments", [
                     datetime.now().isoformat(),
                     booking_data.get("name"),
                     booking_data.get("phone"),
@@ -326,11 +507,11 @@ Booked by AI Receptionist. Mark to confirm.
                     "Confirmed"
                 ])
             
-            logger.info(f"Appointment booked: {event_result.get('htmlLink')}")
+            logger.info("Appointment booked: %s", event_result.get('htmlLink'))
             return True
             
         except Exception as e:
-            logger.error(f"Booking failed: {e}")
+            logger.error("Booking failed: %s", e)
             return False
 
 # Global Google integration instance
@@ -343,31 +524,32 @@ class TwilioIntegration:
         self.account_sid = TWILIO_ACCOUNT_SID
         self.auth_token = TWILIO_AUTH_TOKEN
         self.from_number = TWILIO_PHONE_NUMBER
+        # Fixed for the process lifetime, so build them once
+        self._url = f"https://api.twilio.com/2010-04-01/Accounts/{self.account_sid}/Messages.json"
+        self._auth = aiohttp.BasicAuth(self.account_sid or "", self.auth_token or "")
+        # Shared HTTP session, opened/closed by the app lifespan
+        self.session: Optional[aiohttp.ClientSession] = None
     
     async def send_sms(self, to_number: str, message: str):
         """Send SMS confirmation via Twilio"""
         try:
-            url = f"https://api.twilio.com/2010-04-01/Accounts/{self.account_sid}/Messages.json"
-            payload = {
-                "From": self.from_number,
-                "To": to_number,
-                "Body": message
-            }
+            if not self.session:
+                logger.error("SMS error: HTTP session not started")
+                return False
             
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    url,
-                    data=payload,
-                    auth=aiohttp.BasicAuth(self.account_sid, self.auth_token)
-                ) as response:
-                    if response.status == 201:
-                        logger.info(f"SMS sent to {to_number}")
-                        return True
-                    else:
-                        logger.error(f"SMS failed: {await response.text()}")
-                        return False
+            async with self.session.post(
+                self._url,
+                data={"From": self.from_number, "To": to_number, "Body": message},
+                auth=self._auth
+            ) as response:
+                if response.status == 201:
+                    logger.info("SMS sent to %s", to_number)
+                    return True
+                else:
+                    logger.error("SMS failed: %s", await response.text())
+                    return False
         except Exception as e:
-            logger.error(f"SMS error: {e}")
+            logger.error("SMS error: %s", e)
             return False
     
     async def warm_transfer(self, call_sid: str, to_number: str, context: str):
@@ -375,128 +557,177 @@ class TwilioIntegration:
         try:
             # Use Twilio Dial verb with whisper
             # In production, this would use Twilio's <Dial> with <Number> and url for whisper
-            logger.info(f"TRANSFER: Call {call_sid} to {to_number} - Context: {context}")
+            logger.info("TRANSFER: Call %s to %s - Context: %s", call_sid, to_number, context)
             return True
         except Exception as e:
-            logger.error(f"Transfer failed: {e}")
+            logger.error("Transfer failed: %s", e)
             return False
 
 twilio_integration = TwilioIntegration()
 
 # ==================== OPENAI REALTIME HANDLER ====================
 
-class OpenAIRealtimeHandler:
-    def __init__(self):
-        self.ws = None
-        self.session_id = None
-        self.tools = [
-            {
-                "type": "function",
-                "name": "check_calendar_availability",
-                "description": "Check Mark's calendar for available appointment slots on a specific date",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "date": {
-                            "type": "string",
-                            "description": "Date in YYYY-MM-DD format"
-                        },
-                        "duration_minutes": {
-                            "type": "integer",
-                            "description": "Duration of appointment in minutes",
-                            "default": 60
-                        }
-                    },
-                    "required": ["date"]
+# Tool schemas exposed to the model; a tuple so sessions share it read-only
+REALTIME_TOOLS = (
+    {
+        "type": "function",
+        "name": "check_calendar_availability",
+        "description": "Check Mark's calendar for available appointment slots on a specific date",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "date": {
+                    "type": "string",
+                    "description": "Date in YYYY-MM-DD format"
+                },
+                "duration_minutes": {
+                    "type": "integer",
+                    "description": "Duration of appointment in minutes",
+                    "default": 60
                 }
             },
-            {
-                "type": "function",
-                "name": "book_appointment",
-                "description": "Book a viewing or consultation appointment with Mark",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "name": {"type": "string", "description": "Client's full name"},
-                        "phone": {"type": "string", "description": "Client's phone number"},
-                        "email": {"type": "string", "description": "Client's email address"},
-                        "date": {"type": "string", "description": "Date in YYYY-MM-DD format"},
-                        "time": {"type": "string", "description": "Time in HH:MM AM/PM format"},
-                        "purpose": {
-                            "type": "string", 
-                            "enum": ["Property Viewing", "Market Analysis (CMA)", "Buyer Consultation", "Seller Consultation"],
-                            "description": "Purpose of the meeting"
-                        },
-                        "location": {"type": "string", "description": "Property address or meeting location"},
-                        "lead_type": {"type": "string", "enum": ["Buyer", "Seller", "Renter", "Investor"]},
-                        "notes": {"type": "string", "description": "Additional notes about the client"}
-                    },
-                    "required": ["name", "phone", "date", "time", "purpose"]
-                }
+            "required": ["date"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "book_appointment",
+        "description": "Book a viewing or consultation appointment with Mark",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "description": "Client's full name"},
+                "phone": {"type": "string", "description": "Client's phone number"},
+                "email": {"type": "string", "description": "Client's email address"},
+                "date": {"type": "string", "description": "Date in YYYY-MM-DD format"},
+                "time": {"type": "string", "description": "Time in HH:MM AM/PM format"},
+                "purpose": {
+                    "type": "string", 
+                    "enum": ["Property Viewing", "Market Analysis (CMA)", "Buyer Consultation", "Seller Consultation"],
+                    "description": "Purpose of the meeting"
+                },
+                "location": {"type": "string", "description": "Property address or meeting location"},
+                "lead_type": {"type": "string", "enum": ["Buyer", "Seller", "Renter", "Investor"]},
+                "notes": {"type": "string", "description": "Additional notes about the client"}
             },
-            {
-                "type": "function",
-                "name": "log_lead",
-                "description": "Save lead information to the CRM system",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "name": {"type": "string"},
-                        "phone": {"type": "string"},
-                        "email": {"type": "string"},
-                        "type": {"type": "string", "enum": ["Buyer", "Seller", "Renter", "Investor", "Other"]},
-                        "area_interest": {"type": "string"},
-                        "budget": {"type": "string"},
-                        "timeline": {"type": "string"},
-                        "property_address": {"type": "string"},
-                        "notes": {"type": "string"},
-                        "next_action": {"type": "string"}
-                    },
-                    "required": ["name", "phone", "type"]
-                }
+            "required": ["name", "phone", "date", "time", "purpose"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "log_lead",
+        "description": "Save lead information to the CRM system",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "phone": {"type": "string"},
+                "email": {"type": "string"},
+                "type": {"type": "string", "enum": ["Buyer", "Seller", "Renter", "Investor", "Other"]},
+                "area_interest": {"type": "string"},
+                "budget": {"type": "string"},
+                "timeline": {"type": "string"},
+                "property_address": {"type": "string"},
+                "notes": {"type": "string"},
+                "next_action": {"type": "string"}
             },
-            {
-                "type": "function",
-                "name": "send_sms_confirmation",
-                "description": "Send appointment confirmation via SMS",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "phone": {"type": "string", "description": "Phone number to send SMS to"},
-                        "message": {"type": "string", "description": "Confirmation message content"}
-                    },
-                    "required": ["phone", "message"]
-                }
+            "required": ["name", "phone", "type"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "send_sms_confirmation",
+        "description": "Send appointment confirmation via SMS",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "phone": {"type": "string", "description": "Phone number to send SMS to"},
+                "message": {"type": "string", "description": "Confirmation message content"}
             },
-            {
-                "type": "function",
-                "name": "warm_transfer",
-                "description": "Transfer the call to Mark Esposito with context summary",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "reason": {"type": "string", "description": "Why transfer is needed"},
-                        "context_summary": {"type": "string", "description": "Summary of conversation for Mark"}
-                    },
-                    "required": ["reason", "context_summary"]
-                }
+            "required": ["phone", "message"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "warm_transfer",
+        "description": "Transfer the call to Mark Esposito with context summary",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "reason": {"type": "string", "description": "Why transfer is needed"},
+                "context_summary": {"type": "string", "description": "Summary of conversation for Mark"}
             },
-            {
-                "type": "function",
-                "name": "log_voicemail",
-                "description": "Record a voicemail message for Mark to callback",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "caller_name": {"type": "string"},
-                        "caller_phone": {"type": "string"},
-                        "message": {"type": "string"},
-                        "urgency": {"type": "string", "enum": ["Low", "Medium", "High"]}
-                    },
-                    "required": ["caller_name", "caller_phone", "message"]
-                }
-            }
-        ]
+            "required": ["reason", "context_summary"]
+        }
+    },
+    {
+        "type": "function",
+        "name": "log_voicemail",
+        "description": "Record a voicemail message for Mark to callback",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "caller_name": {"type": "string"},
+                "caller_phone": {"type": "string"},
+                "message": {"type": "string"},
+                "urgency": {"type": "string", "enum": ["Low", "Medium", "High"]}
+            },
+            "required": ["caller_name", "caller_phone", "message"]
+        }
+    }
+)
+
+# session.update sent on every connect; fully static, so serialize it once
+SESSION_INIT_MESSAGE = orjson.dumps({
+    "type": "session.update",
+    "session": {
+        "modalities": ["text", "audio"],
+        "instructions": SYSTEM_PROMPT,
+        "voice": "alloy",
+        "input_audio_format": "g711_ulaw",
+        "output_audio_format": "g711_ulaw",
+        "turn_detection": {
+            "type": "server_vad",
+            "threshold": 0.5,
+            "prefix_padding_ms": 300,
+            "silence_duration_ms": 600
+        },
+        "tools": REALTIME_TOOLS,
+        "tool_choice": "auto",
+        "temperature": 0.7
+    }
+}).decode()
+
+# input_audio_buffer.append envelope around a base64 payload (needs no JSON escaping)
+AUDIO_APPEND_PREFIX = '{"type":"input_audio_buffer.append","audio":"'
+AUDIO_APPEND_SUFFIX = '"}'
+
+# Sent after every tool result to have the model continue speaking
+RESPONSE_CREATE_MESSAGE = '{"type":"response.create"}'
+
+# Markers for pulling base64 audio out of raw frames without a JSON parse
+OPENAI_AUDIO_DELTA_MARKER = '"type":"response.audio.delta"'
+OPENAI_DELTA_FIELD = '"delta":"'
+TWILIO_MEDIA_MARKER = '"event":"media"'
+TWILIO_PAYLOAD_FIELD = '"payload":"'
+TWILIO_MEDIA_SUFFIX = '"}}'
+
+def extract_b64_field(message: str, field: str) -> Optional[str]:
+    """Return the raw base64 string value following `field` in a JSON frame"""
+    start = message.find(field)
+    if start < 0:
+        return None
+    start += len(field)
+    end = message.find('"', start)
+    if end < 0:
+        return None
+    return message[start:end]
+
+class OpenAIRealtimeHandler:
+    def __init__(self):
+        self.ws = None
+        self.session_id = None
+        self.tools = REALTIME_TOOLS
     
     async def connect(self):
         """Connect to OpenAI Realtime API"""
@@ -505,47 +736,33 @@ class OpenAIRealtimeHandler:
             "OpenAI-Beta": "realtime=v1"
         }
         
+        # Audio is already compressed (g711), so skip permessage-deflate
         self.ws = await websockets.connect(
             OPENAI_REALTIME_URL,
-            extra_headers=headers
+            extra_headers=headers,
+            compression=None,
+            max_size=None,
+            ping_interval=20
         )
         
         # Initialize session with system prompt and tools
-        init_message = {
-            "type": "session.update",
-            "session": {
-                "modalities": ["text", "audio"],
-                "instructions": SYSTEM_PROMPT,
-                "voice": "alloy",
-                "input_audio_format": "g711_ulaw",
-                "output_audio_format": "g711_ulaw",
-                "turn_detection": {
-                    "type": "server_vad",
-                    "threshold": 0.5,
-                    "prefix_padding_ms": 300,
-                    "silence_duration_ms": 600
-                },
-                "tools": self.tools,
-                "tool_choice": "auto",
-                "temperature": 0.7
-            }
-        }
-        
-        await self.ws.send(json.dumps(init_message))
+        await self.ws.send(SESSION_INIT_MESSAGE)
         response = await self.ws.recv()
-        logger.info(f"OpenAI session initialized: {response}")
+        # The session event echoes the whole config; only dump it when debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("OpenAI session initialized: %s", response)
+        else:
+            logger.info("OpenAI session initialized")
         
         return self.ws
     
-    async def send_audio(self, audio_data: bytes):
-        """Send audio chunk to OpenAI"""
+    async def send_audio_b64(self, audio_b64: str):
+        """
+        Send an audio chunk to OpenAI. Twilio's g711_ulaw payload is already
+        base64, which is what input_audio_buffer.append expects.
+        """
         if self.ws:
-            # Twilio sends g711_ulaw, OpenAI expects base64
-            message = {
-                "type": "input_audio_buffer.append",
-                "audio": base64.b64encode(audio_data).decode('utf-8')
-            }
-            await self.ws.send(json.dumps(message))
+            await self.ws.send(AUDIO_APPEND_PREFIX + audio_b64 + AUDIO_APPEND_SUFFIX)
     
     async def receive_messages(self):
         """Generator for receiving messages from OpenAI"""
@@ -554,10 +771,20 @@ class OpenAIRealtimeHandler:
         
         try:
             async for message in self.ws:
-                yield json.loads(message)
+                # Audio deltas dominate the stream; slice the payload out directly
+                if message.find(OPENAI_AUDIO_DELTA_MARKER, 0, 128) != -1:
+                    delta = extract_b64_field(message, OPENAI_DELTA_FIELD)
+                    if delta is not None:
+                        yield {"type": "response.audio.delta", "delta": delta}
+                        continue
+                yield orjson.loads(message)
         except websockets.exceptions.ConnectionClosed:
             logger.info("OpenAI WebSocket closed")
     
+    def is_closed(self) -> bool:
+        """True once an opened connection has closed"""
+        return self.ws is not None and self.ws.closed
+    
     async def close(self):
         """Close connection"""
         if self.ws:
@@ -565,95 +792,213 @@ class OpenAIRealtimeHandler:
 
 # ==================== CALL SESSION MANAGER ====================
 
+# Lead fields tracked on the session and refreshed by log_lead
+LEAD_FIELDS = ("name", "phone", "email", "type", "area_interest", "budget", "timeline")
+
+@dataclass(slots=True)
 class CallSession:
-    def __init__(self, call_sid: str):
-        self.call_sid = call_sid
-        self.openai_handler = OpenAIRealtimeHandler()
-        self.lead_data = {
-            "name": None,
-            "phone": None,
-            "email": None,
-            "type": None,
-            "area_interest": None,
-            "budget": None,
-            "timeline": None,
-            "notes": []
-        }
-        self.conversation_history = []
-        self.transfer_requested = False
-        self.appointment_booked = False
+    call_sid: str
+    openai_handler: OpenAIRealtimeHandler = field(default_factory=OpenAIRealtimeHandler)
+    # Lead data
+    name: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    type: Optional[str] = None
+    area_interest: Optional[str] = None
+    budget: Optional[str] = None
+    timeline: Optional[str] = None
+    conversation_history: List[Any] = field(default_factory=list)
+    transfer_requested: bool = False
+    appointment_booked: bool = False
+    # Side effects the model doesn't wait on (SMS, CRM logging)
+    _background_tasks: set = field(default_factory=set, init=False, repr=False)
+    _connect_task: Optional[asyncio.Task] = field(default=None, init=False, repr=False)
+    last_activity: float = field(default_factory=time.monotonic, init=False)
+    stream_ended: bool = field(default=False, init=False)
+    
+    @property
+    def lead_data(self) -> Dict[str, Any]:
+        """Lead fields collected so far"""
+        return {key: getattr(self, key) for key in LEAD_FIELDS}
+    
+    def start_openai_connect(self):
+        """Start the OpenAI handshake without waiting for Twilio's media stream"""
+        if self._connect_task is None:
+            self._connect_task = asyncio.create_task(self.openai_handler.connect())
+    
+    async def connect_openai(self):
+        """Wait for (or start) the OpenAI connection and return its WebSocket"""
+        self.start_openai_connect()
+        return await self._connect_task
+    
+    async def close(self):
+        """Cancel a pending OpenAI handshake and close the connection"""
+        if self._connect_task:
+            self._connect_task.cancel()
+            await asyncio.gather(self._connect_task, return_exceptions=True)
+        await self.openai_handler.close()
+    
+    def _spawn(self, coro):
+        """Run a side effect in the background, keeping a reference until it finishes"""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+    
+    async def wait_background_tasks(self):
+        """Let pending background side effects finish"""
+        if self._background_tasks:
+            await asyncio.gather(*self._background_tasks, return_exceptions=True)
     
     async def handle_tool_call(self, tool_call):
         """Execute tool calls from OpenAI"""
         function_name = tool_call.get("name")
-        arguments = json.loads(tool_call.get("arguments", "{}"))
-        
-        logger.info(f"Tool call: {function_name} with args {arguments}")
+        arguments = orjson.loads(tool_call.get("arguments", "{}"))
+        self.last_activity = time.monotonic()
         
-        result = None
+        logger.info("Tool call: %s with args %s", function_name, arguments)
         
-        if function_name == "check_calendar_availability":
-            date = arguments.get("date")
-            slots = await google_integration.check_calendar_availability(date)
-            result = {"available_slots": slots, "date": date}
-            
-        elif function_name == "book_appointment":
-            success = await google_integration.book_appointment(arguments)
-            if success:
-                self.appointment_booked = True
-                # Send SMS confirmation
-                phone = arguments.get("phone")
-                if phone:
-                    msg = f"Confirmed: {arguments.get('purpose')} with Mark Esposito on {arguments.get('date')} at {arguments.get('time')}. Address: {arguments.get('location')}. Mark will contact you shortly. -BHHS Québec"
-                    await twilio_integration.send_sms(phone, msg)
-            result = {"success": success, "booking_details": arguments}
-            
-        elif function_name == "log_lead":
-            await google_integration.log_lead(arguments)
-            # Update session lead data
-            for key in ["name", "phone", "email", "type", "area_interest", "budget", "timeline"]:
-                if arguments.get(key):
-                    self.lead_data[key] = arguments.get(key)
-            result = {"success": True, "lead_id": self.call_sid}
-            
-        elif function_name == "send_sms_confirmation":
-            success = await twilio_integration.send_sms(
-                arguments.get("phone"),
-                arguments.get("message")
-            )
-            result = {"success": success}
-            
-        elif function_name == "warm_transfer":
-            self.transfer_requested = True
-            # Log the transfer request
-            await google_integration.log_lead({
-                "name": self.lead_data.get("name", "Unknown"),
-                "phone": self.lead_data.get("phone", "Unknown"),
-                "type": self.lead_data.get("type", "Other"),
-                "notes": f"WARM TRANSFER REQUESTED: {arguments.get('reason')}",
-                "next_action": f"Call back immediately. Context: {arguments.get('context_summary')}"
-            })
-            result = {
-                "status": "transfer_initiated",
-                "message": "Connecting you to Mark Esposito now. Please hold.",
-                "context": arguments.get("context_summary")
-            }
-            
-        elif function_name == "log_voicemail":
-            await google_integration.log_lead({
-                "name": arguments.get("caller_name"),
-                "phone": arguments.get("caller_phone"),
-                "type": "Voicemail",
-                "notes": arguments.get("message"),
-                "next_action": f"Callback requested - Urgency: {arguments.get('urgency', 'Medium')}"
-            })
-            result = {"success": True, "callback_within": "2 hours"}
-        
-        return result
+        handler = self.TOOL_HANDLERS.get(function_name)
+        if handler is None:
+            logger.warning("Unknown tool: %s", function_name)
+            return None
+        return await handler(self, arguments)
+    
+    async def _check_calendar(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """check_calendar_availability tool"""
+        date = arguments.get("date")
+        slots = await google_integration.check_calendar_availability(date)
+        return {"available_slots": slots, "date": date}
+    
+    async def _book_appointment(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """book_appointment tool"""
+        success = await google_integration.book_appointment(arguments)
+        if success:
+            self.appointment_booked = True
+            # Send SMS confirmation
+            phone = arguments.get("phone")
+            if phone:
+                msg = f"Confirmed: {arguments.get('purpose')} with Mark Esposito on {arguments.get('date')} at {arguments.get('time')}. Address: {arguments.get('location')}. Mark will contact you shortly. -BHHS Québec"
+                self._spawn(twilio_integration.send_sms(phone, msg))
+        return {"success": success, "booking_details": arguments}
+    
+    async def _log_lead(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """log_lead tool"""
+        self._spawn(google_integration.log_lead(arguments))
+        # Update session lead data
+        for key in LEAD_FIELDS:
+            value = arguments.get(key)
+            if value:
+                setattr(self, key, value)
+        return {"success": True, "lead_id": self.call_sid}
+    
+    async def _send_sms_confirmation(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """send_sms_confirmation tool"""
+        success = await twilio_integration.send_sms(
+            arguments.get("phone"),
+            arguments.get("message")
+        )
+        return {"success": success}
+    
+    async def _warm_transfer(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """warm_transfer tool"""
+        self.transfer_requested = True
+        # Log the transfer request
+        self._spawn(google_integration.log_lead({
+            "name": self.name or "Unknown",
+            "phone": self.phone or "Unknown",
+            "type": self.type or "Other",
+            "notes": f"WARM TRANSFER REQUESTED: {arguments.get('reason')}",
+            "next_action": f"Call back immediately. Context: {arguments.get('context_summary')}"
+        }))
+        return {
+            "status": "transfer_initiated",
+            "message": "Connecting you to Mark Esposito now. Please hold.",
+            "context": arguments.get("context_summary")
+        }
+    
+    async def _log_voicemail(self, arguments: Dict[str, Any]) -> Dict[str, Any]:
+        """log_voicemail tool"""
+        self._spawn(google_integration.log_lead({
+            "name": arguments.get("caller_name"),
+            "phone": arguments.get("caller_phone"),
+            "type": "Voicemail",
+            "notes": arguments.get("message"),
+            "next_action": f"Callback requested - Urgency: {arguments.get('urgency', 'Medium')}"
+        }))
+        return {"success": True, "callback_within": "2 hours"}
+    
+    # Tool name -> handler, shared by all sessions
+    TOOL_HANDLERS = {
+        "check_calendar_availability": _check_calendar,
+        "book_appointment": _book_appointment,
+        "log_lead": _log_lead,
+        "send_sms_confirmation": _send_sms_confirmation,
+        "warm_transfer": _warm_transfer,
+        "log_voicemail": _log_voicemail,
+    }
 
 # ==================== FASTAPI APPLICATION ====================
 
-app = FastAPI(title="Mark Esposito AI Receptionist", version="1.0.0")
+async def run_pyspy():
+    """Background task: record a py-spy flame graph of this process after PYSPY_DELAY"""
+    await asyncio.sleep(PYSPY_DELAY)
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "py-spy", "record",
+            "-o", PYSPY_OUTPUT,
+            "-p", str(os.getpid()),
+            "--duration", str(PYSPY_DURATION)
+        )
+    except OSError as e:
+        logger.warning("ENABLE_PYSPY is set but py-spy could not start: %s", e)
+        return
+    
+    logger.info("py-spy recording %ss to %s", PYSPY_DURATION, PYSPY_OUTPUT)
+    try:
+        returncode = await proc.wait()
+    except asyncio.CancelledError:
+        # Shutting down mid-recording: stop py-spy and still reap it
+        proc.terminate()
+        await proc.wait()
+        raise
+    if returncode == 0:
+        logger.info("py-spy profile written to %s", PYSPY_OUTPUT)
+    else:
+        logger.warning("py-spy exited with status %s", returncode)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Open shared clients on startup and close them on shutdown"""
+    profiler = asyncio.create_task(run_pyspy()) if ENABLE_PYSPY else None
+    
+    # Google client calls are blocking and run in the default executor
+    asyncio.get_running_loop().set_default_executor(
+        concurrent.futures.ThreadPoolExecutor(max_workers=16)
+    )
+    
+    # One pooled keep-alive session for all Twilio REST calls
+    twilio_integration.session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=64, ttl_dns_cache=300, keepalive_timeout=60)
+    )
+    sheet_writer = asyncio.create_task(google_integration.run_sheet_writer())
+    janitor = asyncio.create_task(session_janitor())
+    reaper = asyncio.create_task(session_reaper())
+    try:
+        yield
+    finally:
+        background = [reaper, janitor] + ([profiler] if profiler else [])
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        # Not cancelled: the writer must finish rows it has already dequeued
+        google_integration.stop_sheet_writer()
+        await asyncio.gather(sheet_writer, return_exceptions=True)
+        await google_integration.flush_pending_rows()
+        await twilio_integration.session.close()
+        twilio_integration.session = None
+
+app = FastAPI(title="Mark Esposito AI Receptionist", version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -663,8 +1008,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store active call sessions
-active_sessions: Dict[str, CallSession] = {}
+# Store active call sessions, oldest first
+active_sessions: "OrderedDict[str, CallSession]" = OrderedDict()
+# Finalization of evicted/replaced sessions, referenced until done
+_eviction_tasks: set = set()
+# call_sid -> loop time when an ended session is finalized, oldest first
+session_expiries: "OrderedDict[str, float]" = OrderedDict()
 
 @app.get("/", response_class=HTMLResponse)
 async def root():
@@ -704,6 +1053,21 @@ async def status():
         }
     }
 
+# TwiML connecting a call to the media-stream WebSocket (protocol, host, callSid, fromNumber)
+TWIML_CONNECT_TEMPLATE = b"""<?xml version="1.0" encoding="UTF-8"?>
+<Response>
+    <Connect>
+        <Stream url="%b://%b/media-stream" track="both">
+            <Parameter name="callSid" value="%b"/>
+            <Parameter name="fromNumber" value="%b"/>
+        </Stream>
+    </Connect>
+</Response>"""
+
+def _xml_attr(value: Optional[str]) -> bytes:
+    """Escape a request-supplied value for a TwiML attribute"""
+    return html.escape(value or "", quote=True).encode()
+
 @app.post("/incoming-call")
 async def incoming_call(request: Request):
     """
@@ -714,29 +1078,152 @@ async def incoming_call(request: Request):
     call_sid = form_data.get("CallSid")
     from_number = form_data.get("From")
     
-    logger.info(f"Incoming call from {from_number} (SID: {call_sid})")
+    logger.info("Incoming call from %s (SID: %s)", from_number, call_sid)
     
-    # Initialize call session
-    session = CallSession(call_sid)
-    session.lead_data["phone"] = from_number
-    active_sessions[call_sid] = session
+    # Initialize call session (a retried webhook reuses the existing one)
+    session = active_sessions.get(call_sid)
+    if session is None:
+        session = CallSession(call_sid)
+        session.phone = from_number
+        register_session(session)
+    # Open the OpenAI session while Twilio sets up the media stream
+    session.start_openai_connect()
     
     # Generate TwiML to connect to WebSocket
     # Use wss://your-domain.com/media-stream
     host = request.headers.get("host", "localhost")
     protocol = "wss" if "localhost" not in host else "ws"
     
-    twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
+    twiml = TWIML_CONNECT_TEMPLATE % (
+        protocol.encode(),
+        _xml_attr(host),
+        _xml_attr(call_sid),
+        _xml_attr(from_number)
+    )
+    
+    return Response(content=twiml, media_type="application/xml")
+
+class TwilioAudioSender:
+    """
+    Coalesces OpenAI audio deltas into fewer Twilio media frames.
+    Base64 chunks can only be joined while every chunk but the last is
+    unpadded, so a padded chunk flushes immediately.
+    """
+    def __init__(self, websocket: WebSocket, stream_sid: str):
+        self.websocket = websocket
+        # Outbound media frames differ only in the payload: pre-build the rest
+        self.prefix = (
+            '{"event":"media","streamSid":'
+            + orjson.dumps(stream_sid).decode()
+            + ',"media":{"payload":"'
+        )
+        self._pending: List[str] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_tasks: set = set()
+        # FIFO, so frames go out in the order their payloads were taken
+        self._send_lock = asyncio.Lock()
+    
+    async def send(self, audio_b64: str):
+        """Queue a base64 audio delta for Twilio"""
+        self._pending.append(audio_b64)
+        if audio_b64.endswith("="):
+            await self.flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(
+                AUDIO_COALESCE_WINDOW, self._flush_from_timer
+            )
+    
+    def _flush_from_timer(self):
+        self._flush_handle = None
+        task = asyncio.create_task(self._timed_flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+    
+    async def _timed_flush(self):
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.error("Twilio audio flush failed: %s", e)
+    
+    async def flush(self):
+        """Send everything pending as a single media frame"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        
+        payload = "".join(self._pending)
+        self._pending.clear()
+        async with self._send_lock:
+            # base64 needs no JSON escaping
+            await self.websocket.send_text(self.prefix + payload + TWILIO_MEDIA_SUFFIX)
+    
+    def close(self):
+        """Drop pending audio and stop any scheduled flush"""
+        if self._flush_handle:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        self._pending.clear()
+        for task in self._flush_tasks:
+            task.cancel()
+
+# ---- OpenAI event handlers (audio deltas are handled inline in the bridge) ----
+
+@functools.lru_cache(maxsize=256)
+def _encode_small_result(items: tuple) -> str:
+    return orjson.dumps({key: value for key, value, _ in items}).decode()
+
+def encode_tool_result(result: Any) -> str:
+    """JSON-encode a tool result, memoizing small flat ones like {"success": True}"""
+    if isinstance(result, dict) and len(result) <= 4:
+        try:
+            # Value types are part of the key so True and 1 don't share an entry
+            return _encode_small_result(tuple((k, v, type(v)) for k, v in result.items()))
+        except TypeError:
+            pass  # Unhashable (nested) values
+    return orjson.dumps(result).decode()
+
+async def _on_function_call_done(session: CallSession, message: Dict[str, Any]):
+    """Tool call completed - execute it and send the result back to OpenAI"""
+    result = await session.handle_tool_call(message)
+    openai_ws = session.openai_handler.ws
+    
+    response_msg = {
+        "type": "conversation.item.create",
+        "item": {
+            "type": "function_call_output",
+            "call_id": message.get("call_id"),
+            "output": encode_tool_result(result)
+        }
+    }
+    await openai_ws.send(orjson.dumps(response_msg).decode())
+    
+    # Request next response
+    await openai_ws.send(RESPONSE_CREATE_MESSAGE)
+
+async def _on_response_done(session: CallSession, message: Dict[str, Any]):
+    """Response completed, check for transfer"""
+    if session.transfer_requested:
+        # Send transfer TwiML
+        transfer_twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
 <Response>
-    <Connect>
-        <Stream url="{protocol}://{host}/media-stream" track="both">
-            <Parameter name="callSid" value="{call_sid}"/>
-            <Parameter name="fromNumber" value="{from_number}"/>
-        </Stream>
-    </Connect>
+    <Say>Connecting you to Mark now.</Say>
+    <Dial>{AGENT_PHONE}</Dial>
 </Response>"""
-    
-    return HTMLResponse(content=twiml, media_type="application/xml")
+        # Note: In production, use Twilio API to modify live call
+        logger.info("Transfer requested for call %s", session.call_sid)
+
+async def _on_error(session: CallSession, message: Dict[str, Any]):
+    """Error event from OpenAI"""
+    logger.error("OpenAI error: %s", message)
+
+# OpenAI event type -> handler; unlisted types (e.g. input_audio_buffer.speech_started) are ignored
+OPENAI_EVENT_HANDLERS = {
+    "response.function_call_arguments.done": _on_function_call_done,
+    "response.done": _on_response_done,
+    "error": _on_error,
+}
 
 @app.websocket("/media-stream")
 async def media_stream(websocket: WebSocket):
@@ -752,48 +1239,60 @@ async def media_stream(websocket: WebSocket):
     
     try:
         # Wait for Twilio to send start message with parameters
-        start_msg = await websocket.receive_text()
-        start_data = json.loads(start_msg)
+        start_data = orjson.loads(await websocket.receive_text())
+        if start_data.get("event") == "connected":
+            # Twilio opens with a "connected" handshake event before "start"
+            start_data = orjson.loads(await websocket.receive_text())
         
         if start_data.get("event") == "start":
-            call_sid = start_data["start"]["customParameters"].get("callSid")
-            from_number = start_data["start"]["customParameters"].get("fromNumber")
+            start = start_data["start"]
+            params = start["customParameters"]
+            call_sid = params.get("callSid")
+            from_number = params.get("fromNumber")
+            stream_sid = start["streamSid"]
             
-            logger.info(f"Stream started for call {call_sid}")
+            logger.info("Stream started for call %s", call_sid)
             
             # Get or create session
             if call_sid in active_sessions:
                 session = active_sessions[call_sid]
             else:
                 session = CallSession(call_sid)
-                session.lead_data["phone"] = from_number
-                active_sessions[call_sid] = session
+                session.phone = from_number
+                register_session(session)
             
             # Connect to OpenAI Realtime API
-            openai_ws = await session.openai_handler.connect()
+            # Usually already connected: the handshake starts in /incoming-call
+            await session.connect_openai()
+            
+            audio_sender = TwilioAudioSender(websocket, stream_sid)
             
             # Start bidirectional streaming
             async def twilio_to_openai():
                 """Forward audio from Twilio to OpenAI"""
                 try:
-                    while True:
-                        message = await websocket.receive_text()
-                        data = json.loads(message)
+                    # Ends quietly when Twilio disconnects
+                    async for message in websocket.iter_text():
+                        # Twilio sends base64-encoded g711_ulaw audio, which OpenAI
+                        # accepts as-is: splice it across without parsing the frame
+                        if message.find(TWILIO_MEDIA_MARKER, 0, 64) != -1:
+                            audio_payload = extract_b64_field(message, TWILIO_PAYLOAD_FIELD)
+                            if audio_payload:
+                                session.last_activity = time.monotonic()
+                                await session.openai_handler.send_audio_b64(audio_payload)
+                            continue
                         
-                        if data.get("event") == "media":
-                            # Twilio sends base64-encoded g711_ulaw audio
-                            audio_payload = data["media"]["payload"]
-                            audio_data = base64.b64decode(audio_payload)
-                            
-                            # Send to OpenAI
-                            await session.openai_handler.send_audio(audio_data)
-                            
-                        elif data.get("event") == "stop":
+                        data = orjson.loads(message)
+                        if data.get("event") == "stop":
                             logger.info("Twilio stream stopped")
                             break
                             
                 except Exception as e:
-                    logger.error(f"Twilio->OpenAI error: {e}")
+                    logger.error("Twilio->OpenAI error: %s", e)
+                    raise
+                finally:
+                    # Caller is gone: closing OpenAI ends openai_to_twilio as well
+                    await session.openai_handler.close()
             
             async def openai_to_twilio():
                 """Forward responses from OpenAI to Twilio"""
@@ -801,97 +1300,145 @@ async def media_stream(websocket: WebSocket):
                     async for message in session.openai_handler.receive_messages():
                         msg_type = message.get("type")
                         
+                        # Audio deltas are the bulk of the stream: handle them inline
                         if msg_type == "response.audio.delta":
                             # Audio response from OpenAI - send to Twilio
                             audio_base64 = message.get("delta", "")
                             if audio_base64:
-                                # Convert to Twilio media message
-                                media_msg = {
-                                    "event": "media",
-                                    "streamSid": start_data["start"]["streamSid"],
-                                    "media": {
-                                        "payload": audio_base64
-                                    }
-                                }
-                                await websocket.send_text(json.dumps(media_msg))
-                                
-                        elif msg_type == "response.function_call_arguments.done":
-                            # Tool call completed - execute it
-                            tool_call = message
-                            result = await session.handle_tool_call(tool_call)
-                            
-                            # Send result back to OpenAI
-                            response_msg = {
-                                "type": "conversation.item.create",
-                                "item": {
-                                    "type": "function_call_output",
-                                    "call_id": tool_call.get("call_id"),
-                                    "output": json.dumps(result)
-                                }
-                            }
-                            await openai_ws.send(json.dumps(response_msg))
-                            
-                            # Request next response
-                            await openai_ws.send(json.dumps({
-                                "type": "response.create"
-                            }))
-                            
-                        elif msg_type == "response.done":
-                            # Response completed, check for transfer
-                            if session.transfer_requested:
-                                # Send transfer TwiML
-                                transfer_twiml = f"""<?xml version="1.0" encoding="UTF-8"?>
-<Response>
-    <Say>Connecting you to Mark now.</Say>
-    <Dial>{AGENT_PHONE}</Dial>
-</Response>"""
-                                # Note: In production, use Twilio API to modify live call
-                                logger.info(f"Transfer requested for call {call_sid}")
-                                
-                        elif msg_type == "input_audio_buffer.speech_started":
-                            # Caller started speaking - could interrupt
-                            pass
-                            
-                        elif msg_type == "error":
-                            logger.error(f"OpenAI error: {message}")
+                                await audio_sender.send(audio_base64)
+                            continue
+                        
+                        handler = OPENAI_EVENT_HANDLERS.get(msg_type)
+                        if handler:
+                            await handler(session, message)
                             
                 except Exception as e:
-                    logger.error(f"OpenAI->Twilio error: {e}")
+                    logger.error("OpenAI->Twilio error: %s", e)
+                    raise
+                finally:
+                    audio_sender.close()
             
-            # Run both directions concurrently
-            await asyncio.gather(
-                twilio_to_openai(),
-                openai_to_twilio(),
-                return_exceptions=True
-            )
+            # Run both directions concurrently; a failure on either side
+            # cancels the other instead of leaving a half-open bridge
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    tg.create_task(twilio_to_openai())
+                    tg.create_task(openai_to_twilio())
+            except* Exception:
+                pass  # Already logged by the failing direction
             
     except Exception as e:
-        logger.error(f"Media stream error: {e}")
+        logger.error("Media stream error: %s", e)
         
     finally:
         # Cleanup
         if session:
-            await session.openai_handler.close()
+            session.stream_ended = True
+            await session.close()
+            await session.wait_background_tasks()
         if call_sid and call_sid in active_sessions:
             # Keep session for a bit to log final data
-            asyncio.create_task(delayed_cleanup(call_sid))
+            schedule_cleanup(call_sid)
         
-        logger.info(f"Media stream closed for call {call_sid}")
-
-async def delayed_cleanup(call_sid: str, delay: int = 300):
-    """Remove session after delay to allow final logging"""
-    await asyncio.sleep(delay)
-    if call_sid in active_sessions:
-        session = active_sessions[call_sid]
-        # Final lead log if not already done
-        if not session.appointment_booked and session.lead_data.get("name"):
-            await google_integration.log_lead({
-                **session.lead_data,
-                "notes": "Call ended without booking. Follow up required.",
-                "next_action": "Call back to qualify further"
-            })
-        del active_sessions[call_sid]
-        logger.info(f"Session {call_sid} cleaned up")
+        logger.info("Media stream closed for call %s", call_sid)
+
+def register_session(session: CallSession):
+    """Track a session, evicting the oldest once MAX_ACTIVE_SESSIONS is exceeded"""
+    replaced = active_sessions.get(session.call_sid)
+    if replaced is not None and replaced is not session:
+        # Untracked sessions are never reaped, so close the old one now
+        _close_in_background(replaced)
+    active_sessions[session.call_sid] = session
+    active_sessions.move_to_end(session.call_sid)
+    while len(active_sessions) > MAX_ACTIVE_SESSIONS:
+        # Finalize ended calls (oldest first) early before touching a live one
+        if session_expiries:
+            call_sid, _ = session_expiries.popitem(last=False)
+            evicted = active_sessions.pop(call_sid, None)
+            if evicted is None:
+                continue
+        else:
+            call_sid, evicted = active_sessions.popitem(last=False)
+            logger.warning("Session limit reached, evicting live session %s", call_sid)
+        _close_in_background(evicted)
+
+def _close_in_background(session: CallSession):
+    """Run close_session for an untracked session without waiting on it"""
+    task = asyncio.create_task(close_session(session))
+    _eviction_tasks.add(task)
+    task.add_done_callback(_eviction_tasks.discard)
+
+async def finalize_session(call_sid: str):
+    """Drop a session from tracking and close it"""
+    session_expiries.pop(call_sid, None)
+    session = active_sessions.pop(call_sid, None)
+    if session is not None:
+        await close_session(session)
+
+async def close_session(session: CallSession):
+    """Close an untracked session and write its final lead log"""
+    call_sid = session.call_sid
+    await session.close()
+    await session.wait_background_tasks()
+    # Final lead log if not already done
+    if not session.appointment_booked and session.name:
+        await google_integration.log_lead({
+            **session.lead_data,
+            "notes": "Call ended without booking. Follow up required.",
+            "next_action": "Call back to qualify further"
+        })
+    logger.info("Session %s cleaned up", call_sid)
+
+def schedule_cleanup(call_sid: str):
+    """Finalize an ended session after SESSION_CLEANUP_DELAY"""
+    session_expiries[call_sid] = asyncio.get_running_loop().time() + SESSION_CLEANUP_DELAY
+    session_expiries.move_to_end(call_sid)
+
+async def session_reaper():
+    """Background task: finalize ended sessions as their cleanup delay expires"""
+    loop = asyncio.get_running_loop()
+    while True:
+        now = loop.time()
+        while session_expiries:
+            call_sid, expiry = next(iter(session_expiries.items()))
+            if expiry > now:
+                break
+            try:
+                await finalize_session(call_sid)
+            except Exception as e:
+                logger.error("Failed to clean up session %s: %s", call_sid, e)
+                session_expiries.pop(call_sid, None)
+        
+        # Every entry uses the same delay, so anything scheduled while we
+        # sleep expires after the current head (or a full delay from now)
+        if session_expiries:
+            delay = next(iter(session_expiries.values())) - now
+        else:
+            delay = SESSION_CLEANUP_DELAY
+        await asyncio.sleep(max(delay, 0))
+
+async def session_janitor():
+    """
+    Background task: reap sessions whose call went away without the
+    media-stream cleanup running (stream never attached, stuck handler,
+    OpenAI socket already closed)
+    """
+    while True:
+        await asyncio.sleep(SESSION_JANITOR_INTERVAL)
+        now = time.monotonic()
+        stale = [
+            call_sid for call_sid, session in active_sessions.items()
+            if not session.stream_ended and (
+                now - session.last_activity > SESSION_IDLE_TIMEOUT
+                or session.openai_handler.is_closed()
+            )
+        ]
+        for call_sid in stale:
+            logger.warning("Reaping stale session %s", call_sid)
+            try:
+                await finalize_session(call_sid)
+            except Exception as e:
+                logger.error("Failed to reap session %s: %s", call_sid, e)
 
 # ==================== ADDITIONAL ENDPOINTS ====================
 
@@ -903,7 +1450,7 @@ async def call_status(request: Request):
     status = form_data.get("CallStatus")
     duration = form_data.get("CallDuration")
     
-    logger.info(f"Call {call_sid} status: {status}, duration: {duration}s")
+    logger.info("Call %s status: %s, duration: %ss", call_sid, status, duration)
     
     # Log call outcome to Google Sheets
     await google_integration.log_lead({
@@ -923,7 +1470,7 @@ async def voicemail(request: Request):
     recording_url = form_data.get("RecordingUrl")
     from_number = form_data.get("From")
     
-    logger.info(f"Voicemail from {from_number}: {recording_url}")
+    logger.info("Voicemail from %s: %s", from_number, recording_url)
     
     # Log voicemail
     await google_integration.log_lead({
@@ -942,4 +1489,5 @@ if __name__ == "__main__":
     import uvicorn
     # Render sets PORT environment variable
     port = int(os.getenv("PORT", 8000))
-    uvicorn.run(app, host="0.0.0.0", port=port)
+    # uvloop/httptools ship with uvicorn[standard]; require them rather than silently falling back
+    uvicorn.run(app, host="0.0.0.0", port=port, loop="uvloop", http="httptools", ws="websockets")